@@ -0,0 +1,101 @@
+"""Batched background writes for records the response does not wait on.
+
+Chat messages, video history rows and cached opening replies are queued
+by request handlers and written by one daemon thread, which drains up to
+BATCH_SIZE records (or whatever arrived within BATCH_WAIT seconds) and
+stores each kind with a single executemany transaction.
+"""
+import queue
+import threading
+import time
+
+BATCH_SIZE = 64
+BATCH_WAIT = 0.025  # Seconds to wait for more records before writing a batch
+
+_STOP = object()
+
+class BackgroundWriter:
+    def __init__(self, db, batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT):
+        self.db = db
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def add_chat_message(self, session_id, sender, message, user_id=1):
+        """Queue a chat message for db.add_chat_messages_bulk"""
+        self._queue.put(('chat', {
+            'session_id': session_id,
+            'sender': sender,
+            'message': message,
+            'user_id': user_id
+        }))
+
+    def add_videos_to_history(self, videos):
+        """Queue watch history rows for db.add_videos_to_history"""
+        for video in videos:
+            self._queue.put(('video', video))
+
+    def add_opening_reply(self, message_hash, message, reply, embedding=None):
+        """Queue a cached opening reply for db.save_opening_replies, which also prunes expired ones"""
+        self._queue.put(('reply', {
+            'message_hash': message_hash,
+            'message': message,
+            'reply': reply,
+            'embedding': embedding
+        }))
+
+    def close(self):
+        """Write everything still queued and stop the thread"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _drain(self):
+        """Block for the first record, then collect more until the batch is full or the wait runs out"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain()
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        """Write each kind in one transaction, retrying record by record when a batch fails"""
+        kinds = (
+            ('chat', self.db.add_chat_messages_bulk, 'chat message'),
+            ('video', self.db.add_videos_to_history, 'video history row'),
+            ('reply', self.db.save_opening_replies, 'cached reply'),
+        )
+        for kind, write, label in kinds:
+            records = [record for record_kind, record in batch if record_kind == kind]
+            if not records:
+                continue
+            try:
+                write(records)
+            except Exception as e:
+                if len(records) == 1:
+                    print(f"Warning: could not save {label}: {e}")
+                    continue
+                # One bad record rolls back the whole batch; write the rest on
+                # their own so only the failing records are logged and dropped
+                for record in records:
+                    try:
+                        write([record])
+                    except Exception as e:
+                        print(f"Warning: could not save {label}: {e}")
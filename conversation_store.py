@@ -0,0 +1,163 @@
+"""Rolling per-session chat history used to build the Gemini prompt.
+
+History is trimmed to a token budget rather than a message count, so one
+verbose turn cannot crowd out the prompt and many short turns still fit.
+Tokens are counted with tiktoken when it is installed, otherwise estimated
+at about four characters per token.
+
+With REDIS_URL set, history lives in Redis so every worker sees the same
+sessions and idle sessions expire. Without it (or if Redis is unreachable)
+an in-process store with the same idle expiry is used instead.
+"""
+import importlib
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from cachetools import TTLCache
+
+TOKEN_BUDGET = 1500  # Most history tokens sent with each prompt
+MAX_MESSAGES = 50  # Hard cap on stored messages per session
+SESSION_TTL = 3600  # Seconds of inactivity before a session's history expires
+MAX_SESSIONS = 10_000  # In-process sessions kept before the least recent is evicted
+REDIS_MAX_CONNECTIONS = 32
+
+# Lazily loaded tiktoken encoding (False once loading has failed)
+_encoding = None
+
+def get_encoding():
+    """Load the tiktoken encoding used for budgeting (None when unavailable)"""
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        try:
+            tiktoken = importlib.import_module('tiktoken')
+            # Not Gemini's tokenizer, but close enough to budget the prompt
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            print(f"Warning: tiktoken not available, estimating history tokens from length ({e})")
+    return _encoding if _encoding is not False else None
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Token count of one history message (cached, since every turn re-reads the history)"""
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+def trim_to_budget(messages, budget=TOKEN_BUDGET):
+    """Drop the oldest messages until the rest fit the budget, always keeping the newest"""
+    total = sum(count_tokens(m) for m in messages)
+    start = 0
+    while total > budget and start < len(messages) - 1:
+        total -= count_tokens(messages[start])
+        start += 1
+    return messages[start:]
+
+@dataclass
+class Memory:
+    """One session's history with its token counts and pre-joined prompt text"""
+    msgs: deque = field(default_factory=deque)
+    tokens: deque = field(default_factory=deque)
+    total: int = 0
+    joined: str = ""
+
+class InMemoryConversationStore:
+    def __init__(self, token_budget=TOKEN_BUDGET, max_messages=MAX_MESSAGES,
+                 ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        # session_id -> Memory; abandoned sessions expire instead of piling up
+        self._sessions = TTLCache(maxsize=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()  # TTLCache is not thread-safe
+
+    def append(self, session_id, message):
+        """Add a message to a session, dropping the oldest beyond the token budget"""
+        tokens = count_tokens(message)
+        with self._lock:
+            mem = self._sessions.get(session_id) or Memory()
+            # Re-inserting restarts the session's inactivity TTL
+            self._sessions[session_id] = mem
+            mem.msgs.append(message)
+            mem.tokens.append(tokens)
+            mem.total += tokens
+            
+            trimmed = False
+            while len(mem.msgs) > 1 and (
+                mem.total > self.token_budget or len(mem.msgs) > self.max_messages
+            ):
+                mem.msgs.popleft()
+                mem.total -= mem.tokens.popleft()
+                trimmed = True
+            
+            # Appending extends the joined text; only a trim rebuilds it
+            if trimmed:
+                mem.joined = "\n".join(mem.msgs)
+            elif len(mem.msgs) > 1:
+                mem.joined += "\n" + message
+            else:
+                mem.joined = message
+
+    def get_context(self, session_id):
+        """Return the session history as newline-separated text"""
+        with self._lock:
+            mem = self._sessions.get(session_id)
+            return mem.joined if mem else ""
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+class RedisConversationStore:
+    def __init__(self, client, token_budget=TOKEN_BUDGET, max_messages=MAX_MESSAGES, ttl=SESSION_TTL):
+        self.client = client
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(session_id):
+        return f"chat:{session_id}"
+
+    def append(self, session_id, message):
+        """Add a message to a session, trimming and refreshing its TTL in one round-trip"""
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, message)
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def get_context(self, session_id):
+        """Return the newest history that fits the token budget as newline-separated text"""
+        messages = self.client.lrange(self._key(session_id), 0, -1)
+        return "\n".join(trim_to_budget(messages, self.token_budget))
+
+    def clear(self, session_id):
+        self.client.delete(self._key(session_id))
+
+def create_conversation_store():
+    """Use Redis when REDIS_URL is configured and reachable, else in-process memory"""
+    # Load the encoding at startup: the first get_encoding call may download
+    # its BPE file, which must not land on a user's first /chat request
+    get_encoding()
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        try:
+            redis = importlib.import_module('redis')
+            pool = redis.ConnectionPool.from_url(
+                redis_url,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                decode_responses=True
+            )
+            client = redis.Redis(connection_pool=pool)
+            client.ping()
+            return RedisConversationStore(client)
+        except ImportError:
+            print("Warning: redis not available, using in-process conversation memory")
+        except Exception as e:
+            print(f"Warning: Redis unreachable, using in-process conversation memory ({e})")
+    return InMemoryConversationStore()
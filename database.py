@@ -1,16 +1,154 @@
 import sqlite3
 import os
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-import json
+import orjson
+
+# Applied once when a pooled connection is opened; connections are reused for
+# the lifetime of the manager so SQLite's page cache survives across requests
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-64000',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA foreign_keys=ON',  # chat_messages rows cascade with their conversation
+)
+
+# Compiled statements are kept per connection in an LRU keyed by SQL text,
+# so queries with a fixed shape are parsed once and then only re-bound
+STATEMENT_CACHE_SIZE = 256
+
+# Open connections shared by request threads or greenlets. Under the gevent
+# worker (up to 500 connections each) requests queue briefly for one of these;
+# SQLite calls are short and allow only one writer, so more connections would
+# mostly add idle page caches. WAL lets the readers run alongside the writer
+POOL_SIZE = 8
+
+# Cached opening replies older than this are pruned whenever new ones are saved
+OPENING_REPLY_TTL = 24 * 3600
+
+# Conversation list queries, one fixed statement per view
+_SQL_HISTORY_SELECT = '''
+    SELECT c.id, c.session_id, c.title, c.created_at, c.updated_at, c.deleted_at,
+           COUNT(cm.id) as message_count,
+           MAX(cm.timestamp) as last_message_time
+    FROM conversations c
+    LEFT JOIN chat_messages cm ON c.id = cm.conversation_id
+'''
+_SQL_HISTORY_TAIL = '''
+    GROUP BY c.id, c.session_id, c.title, c.created_at, c.updated_at, c.deleted_at
+    ORDER BY c.updated_at DESC
+    LIMIT ?
+'''
+_SQL_HISTORY_ACTIVE = (
+    _SQL_HISTORY_SELECT
+    + 'WHERE c.user_id = ? AND (c.is_deleted = FALSE OR c.is_deleted IS NULL)'
+    + _SQL_HISTORY_TAIL
+)
+_SQL_HISTORY_TRASH = (
+    _SQL_HISTORY_SELECT
+    + 'WHERE c.user_id = ? AND c.is_deleted = TRUE'
+    + _SQL_HISTORY_TAIL
+)
+
+# Chat write path, shared by the single-message and bulk methods so both hit
+# the same cached statements
+_SQL_CONVERSATION_UPSERT = '''
+    INSERT INTO conversations (session_id, user_id, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (session_id, user_id) DO UPDATE SET updated_at = excluded.updated_at
+    RETURNING id
+'''
+_SQL_CHAT_MESSAGE_INSERT = '''
+    INSERT INTO chat_messages (conversation_id, session_id, sender, message)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_CONVERSATION_TOUCH = 'UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = ?'
+_SQL_CONVERSATION_TITLE = 'SELECT title FROM conversations WHERE id = ?'
+_SQL_CONVERSATION_SET_TITLE = 'UPDATE conversations SET title = ? WHERE id = ?'
+
+# Watch history upsert shared by the single and batch paths; keeps the row id
+# and only touches the changed columns
+_SQL_VIDEO_HISTORY_UPSERT = '''
+    INSERT INTO video_history 
+    (video_id, title, channel, thumbnail_url, search_query, user_id, watched_at)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (video_id, user_id) DO UPDATE SET
+        title = excluded.title,
+        channel = excluded.channel,
+        thumbnail_url = excluded.thumbnail_url,
+        search_query = excluded.search_query,
+        watched_at = excluded.watched_at
+'''
 
 class DatabaseManager:
-    def __init__(self, db_path='scoratis.db'):
+    def __init__(self, db_path='scoratis.db', pool_size=POOL_SIZE):
         self.db_path = db_path
+        self.pool_size = pool_size
+        # Build the schema before opening connections: a connection opened
+        # first keeps a stale schema, and the upserts' ON CONFLICT targets
+        # need the unique indexes init_database adds
         self.init_database()
+        self._local = threading.local()  # Connection held by the current thread, if any
+        self._pool = queue.LifoQueue(maxsize=pool_size)  # LIFO reuses the warmest connection
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+    
+    def _connect(self):
+        """Open one pooled connection in autocommit mode with the shared pragmas"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; nested calls on the same thread reuse it"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        
+        conn = self._pool.get()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                # Never hand the next borrower a transaction left open; a
+                # connection that cannot roll back is replaced
+                try:
+                    conn.execute('ROLLBACK')
+                except sqlite3.Error:
+                    conn.close()
+                    conn = self._connect()
+            self._pool.put(conn)
+    
+    def close(self):
+        """Close the pooled connections and finalize their cached statements"""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
     
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
+        # Schema setup runs once, so it uses its own connection with statement
+        # caching disabled; the shared connection's cache only ever holds
+        # the long-lived request-path statements
+        conn = sqlite3.connect(self.db_path, cached_statements=0)
         cursor = conn.cursor()
         
         # Create users table
@@ -113,6 +251,58 @@ class DatabaseManager:
             )
         ''')
         
+        # Cached replies to opening messages (turns with no history), kept across restarts.
+        # The old semantic_cache table held replies from later turns, which depend
+        # on a conversation other sessions do not share, so it is dropped
+        cursor.execute('DROP TABLE IF EXISTS semantic_cache')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS opening_replies (
+                message_hash TEXT PRIMARY KEY, -- SHA-1 of the normalized message
+                message TEXT NOT NULL,
+                reply TEXT NOT NULL,
+                embedding BLOB, -- float32 vector, NULL when embeddings are unavailable
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Indexes for the hot lookup and ordering columns
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_journals_user_updated ON journals (user_id, updated_at DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_journals_folder ON journals (folder_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_user_watched ON video_history (user_id, watched_at DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_session ON chat_messages (session_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_opening_replies_created ON opening_replies (created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_conv_ts ON chat_messages (conversation_id, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conv_user_updated ON conversations (user_id, is_deleted, updated_at DESC)')
+        
+        # One conversation per session; merge duplicates from older databases first
+        if not self._schema_object_exists(cursor, 'idx_conv_session_user'):
+            cursor.execute('''
+                UPDATE chat_messages
+                SET conversation_id = (
+                    SELECT MIN(c2.id)
+                    FROM conversations c1
+                    JOIN conversations c2 ON c2.session_id = c1.session_id AND c2.user_id = c1.user_id
+                    WHERE c1.id = chat_messages.conversation_id
+                )
+                WHERE conversation_id IN (SELECT id FROM conversations)
+            ''')
+            cursor.execute('''
+                DELETE FROM conversations
+                WHERE id NOT IN (SELECT MIN(id) FROM conversations GROUP BY session_id, user_id)
+            ''')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_conv_session_user ON conversations (session_id, user_id)')
+        
+        # One history row per video; keep the latest duplicate from older databases
+        if not self._schema_object_exists(cursor, 'idx_video_user_video'):
+            cursor.execute('''
+                DELETE FROM video_history
+                WHERE id NOT IN (SELECT MAX(id) FROM video_history GROUP BY video_id, user_id)
+            ''')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_video_user_video ON video_history (video_id, user_id)')
+        
+        # Full-text index over journal title/content/tags
+        self.fts_enabled = self._init_journal_search(cursor)
+        
         # Insert default user if not exists
         cursor.execute('''
             INSERT OR IGNORE INTO users (id, username, email) 
@@ -127,67 +317,171 @@ class DatabaseManager:
         conn.commit()
         conn.close()
     
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute a database query with error handling"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
-        cursor = conn.cursor()
+    @staticmethod
+    def _schema_object_exists(cursor, name):
+        """Check whether a table, index or trigger is already defined"""
+        cursor.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (name,))
+        return cursor.fetchone() is not None
+    
+    def _init_journal_search(self, cursor):
+        """Create the FTS5 mirror of journals; returns False if FTS5 is unavailable"""
+        already_built = self._schema_object_exists(cursor, 'journals_fts')
         
         try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS journals_fts
+                USING fts5(title, content, tags, content='journals', content_rowid='id')
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"Warning: FTS5 not available, journal search falls back to LIKE ({e})")
+            return False
+        
+        # Keep the index in sync with the journals table
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS journals_fts_ai AFTER INSERT ON journals BEGIN
+                INSERT INTO journals_fts (rowid, title, content, tags)
+                VALUES (new.id, new.title, new.content, new.tags);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS journals_fts_ad AFTER DELETE ON journals BEGIN
+                INSERT INTO journals_fts (journals_fts, rowid, title, content, tags)
+                VALUES ('delete', old.id, old.title, old.content, old.tags);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS journals_fts_au AFTER UPDATE OF title, content, tags ON journals BEGIN
+                INSERT INTO journals_fts (journals_fts, rowid, title, content, tags)
+                VALUES ('delete', old.id, old.title, old.content, old.tags);
+                INSERT INTO journals_fts (rowid, title, content, tags)
+                VALUES (new.id, new.title, new.content, new.tags);
+            END
+        ''')
+        
+        # Index journals written before the FTS table existed
+        if not already_built:
+            cursor.execute("INSERT INTO journals_fts (journals_fts) VALUES ('rebuild')")
+        return True
+    
+    @staticmethod
+    def _fts_query(search_query):
+        """Turn free text into an FTS5 query of quoted prefix terms"""
+        terms = search_query.split()
+        return ' '.join('"' + term.replace('"', '""') + '"*' for term in terms)
+    
+    @contextmanager
+    def transaction(self):
+        """Group several statements into one write transaction (nested calls join the outer one)"""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield
+                return
+            
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+                conn.execute('COMMIT')
+            except BaseException:
+                # Also covers a failed COMMIT and interrupts (KeyboardInterrupt,
+                # GeneratorExit, gevent timeouts) raised mid-transaction
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+    
+    def execute_query(self, query, params=None, fetch=False):
+        """Execute a database query with error handling"""
+        # Connections are in autocommit mode: a lone statement commits by
+        # itself, and statements inside transaction() share the thread's
+        # connection and commit together
+        with self.connection() as conn:
+            cursor = conn.execute(query, params or ())
             
             if fetch:
                 result = cursor.fetchall()
                 return [dict(row) for row in result]
             else:
-                conn.commit()
                 return cursor.lastrowid
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+    
+    def execute_many(self, query, params_seq):
+        """Execute one statement for every parameter tuple inside a single transaction"""
+        with self.transaction(), self.connection() as conn:
+            cursor = conn.executemany(query, params_seq)
+            return cursor.rowcount
     
     # Journal operations
     def create_journal(self, title, content, tags=None, folder_id=None, user_id=1):
         """Create a new journal entry"""
-        tags_json = json.dumps(tags) if tags else None
+        tags_json = orjson.dumps(tags).decode() if tags else None
         query = '''
             INSERT INTO journals (title, content, tags, folder_id, user_id, updated_at)
             VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
         '''
         return self.execute_query(query, (title, content, tags_json, folder_id, user_id))
     
-    def get_journals(self, user_id=1, folder_id=None, search_query=None):
-        """Get all journals for a user with optional filtering"""
+    def create_journals_bulk(self, journals, user_id=1):
+        """Create many journal entries with one prepared statement and one commit"""
         query = '''
-            SELECT j.*, f.name as folder_name 
-            FROM journals j
-            LEFT JOIN folders f ON j.folder_id = f.id
-            WHERE j.user_id = ?
+            INSERT INTO journals (title, content, tags, folder_id, user_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
         '''
-        params = [user_id]
-        
-        if folder_id:
-            query += ' AND j.folder_id = ?'
-            params.append(folder_id)
-        
-        if search_query:
-            query += ' AND (j.title LIKE ? OR j.content LIKE ? OR j.tags LIKE ?)'
-            search_param = f'%{search_query}%'
-            params.extend([search_param, search_param, search_param])
-        
-        query += ' ORDER BY j.updated_at DESC'
+        rows = [
+            (
+                journal['title'],
+                journal['content'],
+                orjson.dumps(journal['tags']).decode() if journal.get('tags') else None,
+                journal.get('folder_id'),
+                journal.get('user_id', user_id)
+            )
+            for journal in journals
+        ]
+        return self.execute_many(query, rows)
+    
+    def get_journals(self, user_id=1, folder_id=None, search_query=None, parse_tags=True):
+        """Get all journals for a user with optional filtering
+
+        With parse_tags=False the tags column is returned as its stored JSON
+        text, skipping the per-row decode for callers that don't need it.
+        """
+        if search_query and self.fts_enabled and search_query.split():
+            # Cheap user filter first, then the full-text match
+            query = '''
+                SELECT j.*, f.name as folder_name 
+                FROM journals_fts
+                JOIN journals j ON j.id = journals_fts.rowid
+                LEFT JOIN folders f ON j.folder_id = f.id
+                WHERE j.user_id = ?
+                  AND (? IS NULL OR j.folder_id = ?)
+                  AND journals_fts MATCH ?
+                ORDER BY j.updated_at DESC
+            '''
+            folder_param = folder_id or None
+            params = [user_id, folder_param, folder_param, self._fts_query(search_query)]
+        else:
+            # Same statement text with or without a search term; the NULL
+            # checks short-circuit before any LIKE is evaluated
+            query = '''
+                SELECT j.*, f.name as folder_name 
+                FROM journals j
+                LEFT JOIN folders f ON j.folder_id = f.id
+                WHERE j.user_id = ?
+                  AND (? IS NULL OR j.folder_id = ?)
+                  AND (? IS NULL OR j.title LIKE ? OR j.content LIKE ? OR j.tags LIKE ?)
+                ORDER BY j.updated_at DESC
+            '''
+            folder_param = folder_id or None
+            search_param = f'%{search_query}%' if search_query else None
+            params = [user_id, folder_param, folder_param,
+                      search_param, search_param, search_param, search_param]
         
         journals = self.execute_query(query, params, fetch=True)
         
+        if not parse_tags:
+            return journals
+        
         # Parse tags JSON
         for journal in journals:
             if journal['tags']:
-                journal['tags'] = json.loads(journal['tags'])
+                journal['tags'] = orjson.loads(journal['tags'])
             else:
                 journal['tags'] = []
         
@@ -195,30 +489,21 @@ class DatabaseManager:
     
     def update_journal(self, journal_id, title=None, content=None, tags=None, folder_id=None):
         """Update an existing journal"""
-        updates = []
-        params = []
-        
-        if title is not None:
-            updates.append('title = ?')
-            params.append(title)
-        if content is not None:
-            updates.append('content = ?')
-            params.append(content)
-        if tags is not None:
-            updates.append('tags = ?')
-            params.append(json.dumps(tags))
-        if folder_id is not None:
-            updates.append('folder_id = ?')
-            params.append(folder_id)
-        
-        if not updates:
+        if title is None and content is None and tags is None and folder_id is None:
             return False
         
-        updates.append('updated_at = CURRENT_TIMESTAMP')
-        params.append(journal_id)
-        
-        query = f'UPDATE journals SET {", ".join(updates)} WHERE id = ?'
-        self.execute_query(query, params)
+        # NULL means "leave unchanged", so every update shares one statement
+        query = '''
+            UPDATE journals
+            SET title = COALESCE(?, title),
+                content = COALESCE(?, content),
+                tags = COALESCE(?, tags),
+                folder_id = COALESCE(?, folder_id),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        '''
+        tags_json = orjson.dumps(tags).decode() if tags is not None else None
+        self.execute_query(query, (title, content, tags_json, folder_id, journal_id))
         return True
     
     def delete_journal(self, journal_id, user_id=1):
@@ -262,47 +547,45 @@ class DatabaseManager:
     
     def update_folder(self, folder_id, name=None, description=None, color=None):
         """Update an existing folder"""
-        updates = []
-        params = []
-        
-        if name is not None:
-            updates.append('name = ?')
-            params.append(name)
-        if description is not None:
-            updates.append('description = ?')
-            params.append(description)
-        if color is not None:
-            updates.append('color = ?')
-            params.append(color)
-        
-        if not updates:
+        if name is None and description is None and color is None:
             return False
         
-        updates.append('updated_at = CURRENT_TIMESTAMP')
-        params.append(folder_id)
-        
-        query = f'UPDATE folders SET {", ".join(updates)} WHERE id = ?'
-        self.execute_query(query, params)
+        # NULL means "leave unchanged", so every update shares one statement
+        query = '''
+            UPDATE folders
+            SET name = COALESCE(?, name),
+                description = COALESCE(?, description),
+                color = COALESCE(?, color),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        '''
+        self.execute_query(query, (name, description, color, folder_id))
         return True
     
     def delete_folder(self, folder_id, user_id=1):
         """Delete a folder and move its journals to uncategorized"""
-        # First, update journals to remove folder reference
-        self.execute_query('UPDATE journals SET folder_id = NULL WHERE folder_id = ?', (folder_id,))
-        # Then delete the folder
-        query = 'DELETE FROM folders WHERE id = ? AND user_id = ?'
-        self.execute_query(query, (folder_id, user_id))
+        with self.transaction():
+            # First, update journals to remove folder reference
+            self.execute_query('UPDATE journals SET folder_id = NULL WHERE folder_id = ?', (folder_id,))
+            # Then delete the folder
+            query = 'DELETE FROM folders WHERE id = ? AND user_id = ?'
+            self.execute_query(query, (folder_id, user_id))
         return True
     
     # Video history operations
     def add_video_to_history(self, video_id, title, channel, thumbnail_url, search_query, user_id=1):
         """Add a video to watch history"""
-        query = '''
-            INSERT OR REPLACE INTO video_history 
-            (video_id, title, channel, thumbnail_url, search_query, user_id, watched_at)
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        '''
-        return self.execute_query(query, (video_id, title, channel, thumbnail_url, search_query, user_id))
+        return self.execute_query(_SQL_VIDEO_HISTORY_UPSERT, (video_id, title, channel, thumbnail_url, search_query, user_id))
+    
+    def add_videos_to_history(self, videos, user_id=1):
+        """Upsert many videos (dicts with video_id, title, channel, thumbnail_url, search_query) in one transaction"""
+        rows = [
+            (v['video_id'], v['title'], v['channel'], v['thumbnail_url'], v['search_query'], user_id)
+            for v in videos
+        ]
+        if not rows:
+            return 0
+        return self.execute_many(_SQL_VIDEO_HISTORY_UPSERT, rows)
     
     def get_video_history(self, user_id=1, limit=50):
         """Get video watch history"""
@@ -325,45 +608,57 @@ class DatabaseManager:
     
     def get_or_create_conversation(self, session_id, user_id=1):
         """Get existing conversation or create new one"""
-        # Try to get existing conversation
-        query = 'SELECT id FROM conversations WHERE session_id = ? AND user_id = ?'
-        result = self.execute_query(query, (session_id, user_id), fetch=True)
-        
-        if result:
-            return result[0]['id']
-        else:
-            # Create new conversation
-            return self.create_conversation(session_id, user_id)
+        # Single atomic upsert; RETURNING yields the id in both cases
+        return self.execute_query(_SQL_CONVERSATION_UPSERT, (session_id, user_id), fetch=True)[0]['id']
     
     def add_chat_message(self, session_id, sender, message, user_id=1):
         """Add a message to the conversation"""
-        # Get or create conversation
-        conversation_id = self.get_or_create_conversation(session_id, user_id)
-        
-        # Add the message
-        query = '''
-            INSERT INTO chat_messages (conversation_id, session_id, sender, message)
-            VALUES (?, ?, ?, ?)
-        '''
-        self.execute_query(query, (conversation_id, session_id, sender, message))
-        
-        # Update conversation timestamp and generate title if needed
-        self.update_conversation_activity(conversation_id, message if sender == 'user' else None)
+        # All writes for one message share a single commit
+        with self.transaction():
+            # Get or create conversation
+            conversation_id = self.get_or_create_conversation(session_id, user_id)
+            
+            # Add the message
+            self.execute_query(_SQL_CHAT_MESSAGE_INSERT, (conversation_id, session_id, sender, message))
+            
+            # Update conversation timestamp and generate title if needed
+            self.update_conversation_activity(conversation_id, message if sender == 'user' else None)
         
         return conversation_id
     
+    def add_chat_messages_bulk(self, messages):
+        """Add many messages (dicts with session_id, sender, message) in one transaction"""
+        with self.transaction():
+            conversation_ids = {}
+            first_user_message = {}
+            rows = []
+            for msg in messages:
+                key = (msg['session_id'], msg.get('user_id', 1))
+                if key not in conversation_ids:
+                    conversation_ids[key] = self.get_or_create_conversation(*key)
+                conversation_id = conversation_ids[key]
+                if msg['sender'] == 'user':
+                    first_user_message.setdefault(conversation_id, msg['message'])
+                rows.append((conversation_id, msg['session_id'], msg['sender'], msg['message']))
+            
+            self.execute_many(_SQL_CHAT_MESSAGE_INSERT, rows)
+            
+            for conversation_id in conversation_ids.values():
+                self.update_conversation_activity(conversation_id, first_user_message.get(conversation_id))
+        return len(rows)
+    
     def update_conversation_activity(self, conversation_id, user_message=None):
         """Update conversation timestamp and generate title if needed"""
         # Update timestamp
-        self.execute_query('UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = ?', (conversation_id,))
+        self.execute_query(_SQL_CONVERSATION_TOUCH, (conversation_id,))
         
         # Generate title from first user message if no title exists
         if user_message:
-            result = self.execute_query('SELECT title FROM conversations WHERE id = ?', (conversation_id,), fetch=True)
+            result = self.execute_query(_SQL_CONVERSATION_TITLE, (conversation_id,), fetch=True)
             if result and not result[0]['title']:
                 # Create title from first few words of user message
                 title = user_message[:50] + ('...' if len(user_message) > 50 else '')
-                self.execute_query('UPDATE conversations SET title = ? WHERE id = ?', (title, conversation_id))
+                self.execute_query(_SQL_CONVERSATION_SET_TITLE, (title, conversation_id))
     
     def get_conversation_messages(self, session_id, user_id=1):
         """Get all messages for a conversation"""
@@ -378,27 +673,8 @@ class DatabaseManager:
     
     def get_conversation_history(self, user_id=1, limit=20, include_deleted=False):
         """Get list of recent conversations"""
-        where_clause = "WHERE c.user_id = ?"
-        params = [user_id]
-        
-        if not include_deleted:
-            where_clause += " AND (c.is_deleted = FALSE OR c.is_deleted IS NULL)"
-        else:
-            where_clause += " AND c.is_deleted = TRUE"
-        
-        query = f'''
-            SELECT c.id, c.session_id, c.title, c.created_at, c.updated_at, c.deleted_at,
-                   COUNT(cm.id) as message_count,
-                   MAX(cm.timestamp) as last_message_time
-            FROM conversations c
-            LEFT JOIN chat_messages cm ON c.id = cm.conversation_id
-            {where_clause}
-            GROUP BY c.id, c.session_id, c.title, c.created_at, c.updated_at, c.deleted_at
-            ORDER BY c.updated_at DESC
-            LIMIT ?
-        '''
-        params.append(limit)
-        return self.execute_query(query, params, fetch=True)
+        query = _SQL_HISTORY_TRASH if include_deleted else _SQL_HISTORY_ACTIVE
+        return self.execute_query(query, (user_id, limit), fetch=True)
     
     def clear_conversation(self, session_id, user_id=1):
         """Clear/delete a conversation and all its messages"""
@@ -408,18 +684,18 @@ class DatabaseManager:
         
         if result:
             conversation_id = result[0]['id']
-            # Delete messages (CASCADE should handle this, but being explicit)
-            self.execute_query('DELETE FROM chat_messages WHERE conversation_id = ?', (conversation_id,))
-            # Delete conversation
-            self.execute_query('DELETE FROM conversations WHERE id = ?', (conversation_id,))
+            with self.transaction():
+                # Delete messages (CASCADE should handle this, but being explicit)
+                self.execute_query('DELETE FROM chat_messages WHERE conversation_id = ?', (conversation_id,))
+                # Delete conversation
+                self.execute_query('DELETE FROM conversations WHERE id = ?', (conversation_id,))
             return True
         return False
     
     def delete_conversation(self, conversation_id, user_id=1, permanent=False):
         """Move conversation to trash or permanently delete it"""
         if permanent:
-            # Permanently delete conversation and its messages
-            self.execute_query('DELETE FROM chat_messages WHERE conversation_id = ?', (conversation_id,))
+            # Permanently delete conversation; its messages go with it via ON DELETE CASCADE
             query = 'DELETE FROM conversations WHERE id = ? AND user_id = ?'
         else:
             # Soft delete - move to trash
@@ -444,46 +720,57 @@ class DatabaseManager:
     
     def empty_trash(self, user_id=1):
         """Permanently delete all conversations in trash"""
-        # Get all trashed conversation IDs
-        trashed_conversations = self.execute_query(
-            'SELECT id FROM conversations WHERE user_id = ? AND is_deleted = TRUE',
-            (user_id,), fetch=True
-        )
-        
-        # Delete all messages for trashed conversations
-        for conv in trashed_conversations:
-            self.execute_query('DELETE FROM chat_messages WHERE conversation_id = ?', (conv['id'],))
-        
-        # Delete all trashed conversations
+        # Messages are removed by the ON DELETE CASCADE foreign key
         self.execute_query('DELETE FROM conversations WHERE user_id = ? AND is_deleted = TRUE', (user_id,))
         return True
     
+    # Semantic cache operations
+    def save_opening_replies(self, entries, max_age_seconds=OPENING_REPLY_TTL):
+        """Persist cached opening replies and drop expired ones in one transaction"""
+        query = '''
+            INSERT INTO opening_replies (message_hash, message, reply, embedding, created_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (message_hash) DO UPDATE SET
+                reply = excluded.reply,
+                embedding = excluded.embedding,
+                created_at = excluded.created_at
+        '''
+        rows = [(e['message_hash'], e['message'], e['reply'], e.get('embedding')) for e in entries]
+        with self.transaction():
+            self.execute_many(query, rows)
+            self.prune_opening_replies(max_age_seconds)
+    
+    def prune_opening_replies(self, max_age_seconds=OPENING_REPLY_TTL):
+        """Delete cached opening replies older than max_age_seconds"""
+        self.execute_query(
+            "DELETE FROM opening_replies WHERE created_at < datetime('now', ?)",
+            (f'-{int(max_age_seconds)} seconds',)
+        )
+    
+    def get_opening_replies(self, max_age_seconds=OPENING_REPLY_TTL, limit=512):
+        """Drop expired cached opening replies and return the newest live ones, oldest first"""
+        with self.transaction():
+            self.prune_opening_replies(max_age_seconds)
+            entries = self.execute_query('''
+                SELECT message, reply, embedding,
+                       CAST(strftime('%s', created_at) AS INTEGER) AS created_ts
+                FROM opening_replies
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (limit,), fetch=True)
+        entries.reverse()
+        return entries
+    
     # Statistics
     def get_user_stats(self, user_id=1):
         """Get user statistics"""
-        stats = {}
-        
-        # Journal count
-        result = self.execute_query('SELECT COUNT(*) as count FROM journals WHERE user_id = ?', (user_id,), fetch=True)
-        stats['total_journals'] = result[0]['count'] if result else 0
-        
-        # Folder count
-        result = self.execute_query('SELECT COUNT(*) as count FROM folders WHERE user_id = ?', (user_id,), fetch=True)
-        stats['total_folders'] = result[0]['count'] if result else 0
-        
-        # Videos watched
-        result = self.execute_query('SELECT COUNT(*) as count FROM video_history WHERE user_id = ?', (user_id,), fetch=True)
-        stats['videos_watched'] = result[0]['count'] if result else 0
-        
-        # Recent activity
-        result = self.execute_query('''
-            SELECT COUNT(*) as count FROM journals 
-            WHERE user_id = ? AND created_at >= datetime('now', '-7 days')
-        ''', (user_id,), fetch=True)
-        stats['journals_this_week'] = result[0]['count'] if result else 0
-        
-        # Conversation count
-        result = self.execute_query('SELECT COUNT(*) as count FROM conversations WHERE user_id = ?', (user_id,), fetch=True)
-        stats['total_conversations'] = result[0]['count'] if result else 0
-        
-        return stats
\ No newline at end of file
+        query = '''
+            SELECT
+                (SELECT COUNT(*) FROM journals WHERE user_id = :user_id) AS total_journals,
+                (SELECT COUNT(*) FROM folders WHERE user_id = :user_id) AS total_folders,
+                (SELECT COUNT(*) FROM video_history WHERE user_id = :user_id) AS videos_watched,
+                (SELECT COUNT(*) FROM journals
+                 WHERE user_id = :user_id AND created_at >= datetime('now', '-7 days')) AS journals_this_week,
+                (SELECT COUNT(*) FROM conversations WHERE user_id = :user_id) AS total_conversations
+        '''
+        return self.execute_query(query, {'user_id': user_id}, fetch=True)[0]
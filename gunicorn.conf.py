@@ -0,0 +1,15 @@
+# Gunicorn settings for production deployments of main.py:
+#   gunicorn main:app
+# (main_professional runs under gunicorn_gevent.conf.py instead)
+# Threaded workers with keep-alive replace the single-threaded Flask dev server
+import os
+
+bind = os.getenv('BIND', '127.0.0.1:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = 8
+keepalive = 30
+
+# Import the app once in the master so module-level state (the Gemini model,
+# the YouTube discovery client) is built once and shared copy-on-write
+preload_app = True
@@ -0,0 +1,14 @@
+# Gunicorn settings for the main_professional backend:
+#   gunicorn -c gunicorn_gevent.conf.py wsgi:app
+# gevent workers each serve hundreds of requests while they wait on Gemini or YouTube
+import os
+
+bind = os.getenv('BIND', '127.0.0.1:5001')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gevent'
+worker_connections = 500
+keepalive = 30
+
+# Each worker imports the app itself: the SQLite pool and the background
+# writer thread are created at import and cannot be shared across a fork
+preload_app = False
@@ -0,0 +1,23 @@
+"""Deferred imports for heavy dependencies.
+
+lazy_import() registers a module whose code only runs on first attribute
+access, so importing the app does not pay for libraries a request may
+never touch.
+"""
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """Return a lazily executed module, or None if it is not installed"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
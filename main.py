@@ -1,40 +1,53 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
+from flask_compress import Compress
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 # Use official YouTube Data API client
 from googleapiclient.discovery import build
 import json
+import threading
+import httplib2
+from cachetools import TTLCache
+from semantic_cache import SemanticCache
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app) 
+Compress(app)  # gzip JSON responses
 
-# Configure the Gemini API key (lazy loading)
+# Configure the Gemini API key
 api_key = os.getenv("GEMINI_API_KEY")
 youtube_api_key = os.getenv("YOUTUBE_API_KEY")
 
-def get_gemini_client():
-    if not api_key:
-        return None
-    try:
-        genai.configure(api_key=api_key)
-        return True
-    except Exception as e:
-        print(f"Gemini API Configuration Error: {e}")
-        return None
+# httplib2.Http is not thread-safe, so each worker thread gets its own
+_http_local = threading.local()
+
+def get_youtube_http():
+    """Per-thread HTTP client with a 10 second socket timeout"""
+    http = getattr(_http_local, 'http', None)
+    if http is None:
+        http = _http_local.http = httplib2.Http(timeout=10)
+    return http
 
 def get_youtube_client():
     if not youtube_api_key:
         return None
     try:
-        return build('youtube', 'v3', developerKey=youtube_api_key)
+        return build('youtube', 'v3', developerKey=youtube_api_key, http=httplib2.Http(timeout=10))
     except Exception as e:
         print(f"YouTube API Configuration Error: {e}")
         return None
 
+# Build the client once; build() parses the whole discovery document
+youtube_client = get_youtube_client()
+
+# YouTube search results keyed by normalized query, kept for an hour
+_VID_CACHE = TTLCache(maxsize=1024, ttl=3600)
+_VID_CACHE_LOCK = threading.Lock()
+
 # Socratic persona for the chatbot
 system_prompt = """
 You are Scoratis, an AI assistant inspired by the philosopher Socrates. 
@@ -46,13 +59,45 @@ Your purpose is to help users with journaling and self-discovery through thought
 - Acknowledge the user's input before gently guiding them deeper.
 """
 
+# Build the model and generation config once; every /chat request reuses them
+_MODEL = None
+_GEN_CONFIG = None
+if api_key:
+    try:
+        genai.configure(api_key=api_key)
+        _MODEL = genai.GenerativeModel(
+            model_name='gemini-1.5-flash',
+            system_instruction=system_prompt
+        )
+        _GEN_CONFIG = genai.GenerationConfig(
+            max_output_tokens=200,  # Limit response length for speed
+            temperature=0.7,
+        )
+    except Exception as e:
+        print(f"Gemini API Configuration Error: {e}")
+        _MODEL = None
+
+# Replies keyed by exact and semantically similar user messages
+_REPLY_CACHE = SemanticCache(max_entries=512, threshold=0.85)
+
+# Sent instead of an error when Gemini fails
+_FALLBACK_REPLY = "I appreciate your question about journaling. What specific aspect of your thoughts would you like to explore further?"
+
+def sse_event(payload):
+    """Format one Server-Sent Events message carrying a JSON payload"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+def sse_response(events):
+    """Wrap an iterable of SSE messages in an unbuffered event-stream response"""
+    return Response(events, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 @app.route('/')
 def health_check():
     return jsonify({"status": "running", "message": "Scoratis API is healthy"})
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    if not get_gemini_client():
+    if _MODEL is None:
         return jsonify({"error": "Gemini API key is not configured on the server."}), 500
 
     data = request.json
@@ -61,31 +106,65 @@ def chat():
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
 
+    cached_reply, embedding = _REPLY_CACHE.get(user_message)
+    if cached_reply is not None:
+        return jsonify({"reply": cached_reply})
+
     try:
-        model = genai.GenerativeModel(
-            model_name='gemini-1.5-flash',
-            system_instruction=system_prompt
-        )
-        # Add timeout and faster generation config
-        generation_config = genai.GenerationConfig(
-            max_output_tokens=200,  # Limit response length for speed
-            temperature=0.7,
-        )
-        response = model.generate_content(
+        response = _MODEL.generate_content(
             user_message,
-            generation_config=generation_config,
+            generation_config=_GEN_CONFIG,
             request_options={"timeout": 10}  # 10 second timeout
         )
+        _REPLY_CACHE.put(user_message, response.text, embedding)
         return jsonify({"reply": response.text})
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
         # Return a fallback response instead of error
-        fallback_response = f"I appreciate your question about journaling. What specific aspect of your thoughts would you like to explore further?"
-        return jsonify({"reply": fallback_response})
+        return jsonify({"reply": _FALLBACK_REPLY})
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same request as /chat, but the reply is streamed as Server-Sent Events"""
+    if _MODEL is None:
+        return jsonify({"error": "Gemini API key is not configured on the server."}), 500
+
+    data = request.json
+    user_message = data.get('message')
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    cached_reply, embedding = _REPLY_CACHE.get(user_message)
+    if cached_reply is not None:
+        return sse_response([sse_event({"chunk": cached_reply}), sse_event({"done": True})])
+
+    def generate():
+        parts = []
+        try:
+            # Stream tokens to the client as Gemini produces them
+            response = _MODEL.generate_content(
+                user_message,
+                generation_config=_GEN_CONFIG,
+                stream=True,
+                request_options={"timeout": 10}  # 10 second timeout
+            )
+            for chunk in response:
+                parts.append(chunk.text)
+                yield sse_event({"chunk": chunk.text})
+        except Exception as e:
+            print(f"Error calling Gemini API: {e}")
+            # Send a fallback response instead of an error if nothing was streamed yet
+            if not parts:
+                yield sse_event({"chunk": _FALLBACK_REPLY})
+        else:
+            _REPLY_CACHE.put(user_message, "".join(parts), embedding)
+        yield sse_event({"done": True})
+
+    return sse_response(stream_with_context(generate()))
 
 @app.route('/get_videos', methods=['GET'])
 def get_videos():
-    youtube_client = get_youtube_client()
     if not youtube_client:
         return jsonify({"error": "YouTube API is not configured. Please add a YOUTUBE_API_KEY to your .env file."}), 500
         
@@ -94,10 +173,13 @@ def get_videos():
         if not query:
             return jsonify({"error": "Search query cannot be empty"}), 400
 
+        cache_key = query.strip().lower()
+        with _VID_CACHE_LOCK:
+            cached_videos = _VID_CACHE.get(cache_key)
+        if cached_videos is not None:
+            return jsonify(cached_videos)
+
         # Use YouTube Data API with timeout and error handling
-        import socket
-        socket.setdefaulttimeout(10)  # 10 second timeout for all socket operations
-        
         search_response = youtube_client.search().list(
             q=query,
             part='snippet',
@@ -105,7 +187,7 @@ def get_videos():
             maxResults=4,  # Further reduced for speed
             relevanceLanguage='en',
             order='relevance'
-        ).execute()
+        ).execute(http=get_youtube_http())
 
         formatted_videos = []
         for search_result in search_response.get('items', []):
@@ -115,7 +197,9 @@ def get_videos():
                 'channel': search_result['snippet']['channelTitle'],
                 'url_suffix': f"/watch?v={search_result['id']['videoId']}"
             })
-            
+
+        with _VID_CACHE_LOCK:
+            _VID_CACHE[cache_key] = formatted_videos
         return jsonify(formatted_videos)
     except Exception as e:
         print(f"Error fetching videos: {e}")
@@ -1,13 +1,58 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
+from flask_compress import Compress
 import os
 from dotenv import load_dotenv
 import json
+import random
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app) 
+Compress(app)  # gzip JSON responses
+
+# Simple Socratic responses for now (to avoid slow AI API)
+socratic_responses = [
+    "What aspects of this topic resonate most deeply with you?",
+    "Can you tell me more about what prompted this reflection?",
+    "What patterns do you notice in your thinking about this?",
+    "How might exploring this further benefit your understanding?",
+    "What questions arise for you when you consider this more deeply?",
+    "What would it mean for you to understand this better?"
+]
+
+# Each reply body is encoded once; /chat just picks one
+_REPLIES = [('{"reply":' + json.dumps(r) + '}').encode() for r in socratic_responses]
+_N = len(_REPLIES)
+
+# Sample video payload serialized once; only the {Q} markers vary per request
+_VIDEOS_TEMPLATE = json.dumps([
+    {
+        "title": "Educational Video about {Q} - Part 1",
+        "thumbnail": "https://via.placeholder.com/320x180/8A2BE2/FFFFFF?text=Video+1",
+        "channel": "Educational Channel",
+        "url_suffix": "/watch?v=dQw4w9WgXcQ"
+    },
+    {
+        "title": "Learning {Q} - Fundamentals",
+        "thumbnail": "https://via.placeholder.com/320x180/00BFFF/FFFFFF?text=Video+2",
+        "channel": "Science Academy",
+        "url_suffix": "/watch?v=dQw4w9WgXcQ"
+    },
+    {
+        "title": "Advanced {Q} Concepts",
+        "thumbnail": "https://via.placeholder.com/320x180/8A2BE2/FFFFFF?text=Video+3",
+        "channel": "Knowledge Hub",
+        "url_suffix": "/watch?v=dQw4w9WgXcQ"
+    },
+    {
+        "title": "{Q} Explained Simply",
+        "thumbnail": "https://via.placeholder.com/320x180/00BFFF/FFFFFF?text=Video+4",
+        "channel": "Simple Learning",
+        "url_suffix": "/watch?v=dQw4w9WgXcQ"
+    }
+]).encode()
 
 @app.route('/')
 def health_check():
@@ -21,53 +66,17 @@ def chat():
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
 
-    # Simple Socratic responses for now (to avoid slow AI API)
-    socratic_responses = [
-        "What aspects of this topic resonate most deeply with you?",
-        "Can you tell me more about what prompted this reflection?",
-        "What patterns do you notice in your thinking about this?",
-        "How might exploring this further benefit your understanding?",
-        "What questions arise for you when you consider this more deeply?",
-        "What would it mean for you to understand this better?"
-    ]
-    
-    import random
-    response = random.choice(socratic_responses)
-    return jsonify({"reply": response})
+    return Response(_REPLIES[random.randrange(_N)], mimetype='application/json')
 
 @app.route('/get_videos', methods=['GET'])
 def get_videos():
     # Return sample educational videos for now (to avoid slow YouTube API)
     query = request.args.get('q', 'science')
     
-    sample_videos = [
-        {
-            "title": f"Educational Video about {query} - Part 1",
-            "thumbnail": "https://via.placeholder.com/320x180/8A2BE2/FFFFFF?text=Video+1",
-            "channel": "Educational Channel",
-            "url_suffix": "/watch?v=dQw4w9WgXcQ"
-        },
-        {
-            "title": f"Learning {query} - Fundamentals",
-            "thumbnail": "https://via.placeholder.com/320x180/00BFFF/FFFFFF?text=Video+2",
-            "channel": "Science Academy",
-            "url_suffix": "/watch?v=dQw4w9WgXcQ"
-        },
-        {
-            "title": f"Advanced {query} Concepts",
-            "thumbnail": "https://via.placeholder.com/320x180/8A2BE2/FFFFFF?text=Video+3",
-            "channel": "Knowledge Hub",
-            "url_suffix": "/watch?v=dQw4w9WgXcQ"
-        },
-        {
-            "title": f"{query} Explained Simply",
-            "thumbnail": "https://via.placeholder.com/320x180/00BFFF/FFFFFF?text=Video+4",
-            "channel": "Simple Learning",
-            "url_suffix": "/watch?v=dQw4w9WgXcQ"
-        }
-    ]
-    
-    return jsonify(sample_videos)
+    # JSON-escape the query (without its quotes) and splice it into the template
+    safe_query = json.dumps(query)[1:-1].encode()
+    body = _VIDEOS_TEMPLATE.replace(b"{Q}", safe_query)
+    return Response(body, mimetype='application/json')
 
 if __name__ == '__main__':
     print("Starting Scoratis server...")
@@ -1,37 +1,102 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
+import hashlib
 import json
+import orjson
+import re
 import secrets
-import socket
+import atexit
+import functools
+import threading
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from database import DatabaseManager
+from database import DatabaseManager, OPENING_REPLY_TTL
+from background_writer import BackgroundWriter
+from conversation_store import create_conversation_store
+from semantic_cache import SemanticCache, message_hash, vector_to_bytes, vector_from_bytes
+from lazy_import import lazy_import
 
 # Import APIs with lazy loading to avoid startup delays
 import importlib
+requests = lazy_import('requests')
 
 load_dotenv()
 
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for faster request and response encoding"""
+    OPTIONS = orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build the response from orjson's bytes directly, skipping the str round-trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.OPTIONS), mimetype="application/json")
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
-# Initialize database
+# Initialize database (pooled connections, closed on interpreter shutdown)
 db = DatabaseManager()
+atexit.register(db.close)
+
+# Chat messages and video history are written in batches off the request path;
+# registered after db.close so queued records are flushed before it runs
+writer = BackgroundWriter(db)
+atexit.register(writer.close)
 
 # Global variables for API clients
 _genai = None
 _youtube_client = None
+_http = None
+
+# Chat model and generation settings, built once alongside the SDK
+_chat_model = None
+_generation_config = None
+
+# (connect, read) timeout passed explicitly on every outbound HTTP call
+HTTP_TIMEOUT = (3.05, 15)
+
+def get_http_session():
+    """Lazy build the shared keep-alive session so repeat calls skip the TCP/TLS handshake"""
+    global _http
+    if _http is None:
+        session = requests.Session()
+        session.mount('https://', requests.adapters.HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=requests.adapters.Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+        ))
+        _http = session
+    return _http
 
 def get_genai():
     """Lazy load Google Generative AI"""
-    global _genai
+    global _genai, _chat_model, _generation_config
     if _genai is None:
         try:
             genai_module = importlib.import_module('google.generativeai')
             api_key = os.getenv("GEMINI_API_KEY")
             if api_key:
-                genai_module.configure(api_key=api_key)
+                # REST transport goes through a pooled HTTP session instead of a gRPC channel
+                genai_module.configure(api_key=api_key, transport='rest')
+                _chat_model = genai_module.GenerativeModel(
+                    model_name='gemini-1.5-flash',
+                    system_instruction=SYSTEM_PROMPT
+                )
+                _generation_config = genai_module.GenerationConfig(
+                    max_output_tokens=300,  # Allow for more detailed anchor-question responses
+                    temperature=0.7,  # Slightly more focused for teaching
+                    top_p=0.9
+                )
                 _genai = genai_module
             else:
                 print("Warning: GEMINI_API_KEY not found")
@@ -39,19 +104,41 @@ def get_genai():
             print("Warning: google.generativeai not available")
     return _genai
 
+class YouTubeClient:
+    """Minimal YouTube Data API v3 client over the shared pooled session"""
+    BASE_URL = 'https://www.googleapis.com/youtube/v3'
+    
+    def __init__(self, api_key, session=None, timeout=HTTP_TIMEOUT):
+        self.api_key = api_key
+        self.session = session or get_http_session()
+        self.timeout = timeout
+    
+    def _get(self, resource, params):
+        response = self.session.get(
+            f"{self.BASE_URL}/{resource}",
+            params={**params, 'key': self.api_key},
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            # The body carries the API reason (e.g. quotaExceeded, keyInvalid)
+            raise RuntimeError(f"YouTube API error {response.status_code}: {response.text}")
+        return orjson.loads(response.content)
+    
+    def search(self, **params):
+        return self._get('search', params)
+    
+    def videos(self, **params):
+        return self._get('videos', params)
+
 def get_youtube_client():
     """Lazy load YouTube API client"""
     global _youtube_client
     if _youtube_client is None:
-        try:
-            from googleapiclient.discovery import build
-            api_key = os.getenv("YOUTUBE_API_KEY")
-            if api_key:
-                _youtube_client = build('youtube', 'v3', developerKey=api_key)
-            else:
-                print("Warning: YOUTUBE_API_KEY not found")
-        except ImportError:
-            print("Warning: googleapiclient not available")
+        api_key = os.getenv("YOUTUBE_API_KEY")
+        if api_key:
+            _youtube_client = YouTubeClient(api_key)
+        else:
+            print("Warning: YOUTUBE_API_KEY not found")
     return _youtube_client
 
 # Socratic persona for the chatbot
@@ -85,10 +172,63 @@ Surface and resolve confusion, rebuild shaky knowledge, and help users "own" the
 Keep responses conversational, warm, and encouraging. Use everyday language and concrete examples. Turn "I don't know" into progress. Make learning enjoyable and human, not mechanical. Always encourage reflection, summarization, and application.
 """
 
+# ==================== GEMINI REQUEST COALESCING ====================
+
+class InflightRequests:
+    """Coalesce identical concurrent calls so only one of them reaches the backend"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def run(self, key, fn):
+        """Run fn() for key, or wait for the result of an identical call already in flight"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+gemini_requests = InflightRequests()
+
+# Front page bytes and their ETag, read on the first request
+_index_page = None
+
+def get_index_page():
+    """Lazy load index_professional.html so repeat hits skip the stat and read"""
+    global _index_page
+    if _index_page is None:
+        with open('index_professional.html', 'rb') as f:
+            body = f.read()
+        _index_page = (body, hashlib.md5(body).hexdigest())
+    return _index_page
+
 @app.route('/')
 def serve_app():
     """Serve the main application"""
-    return send_from_directory('.', 'index_professional.html')
+    body, etag = get_index_page()
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
 
 @app.route('/health')
 def health_check():
@@ -108,9 +248,10 @@ def get_journals():
     """Get all journals with optional filtering"""
     folder_id = request.args.get('folder_id', type=int)
     search_query = request.args.get('search')
+    parse_tags = request.args.get('tags') != 'raw'  # ?tags=raw leaves tags as JSON text
     
     try:
-        journals = db.get_journals(folder_id=folder_id, search_query=search_query)
+        journals = db.get_journals(folder_id=folder_id, search_query=search_query, parse_tags=parse_tags)
         return jsonify(journals)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -134,6 +275,40 @@ def create_journal():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/journals/bulk', methods=['POST'])
+def create_journals_bulk():
+    """Import many journal entries at once"""
+    data = request.json or {}
+    journals = data.get('journals', [])
+    
+    if not isinstance(journals, list) or not journals:
+        return jsonify({"error": "A non-empty list of journals is required"}), 400
+    
+    entries = []
+    for journal in journals:
+        if not isinstance(journal, dict):
+            return jsonify({"error": "Title and content are required for every journal"}), 400
+        title = journal.get('title') or ''
+        content = journal.get('content') or ''
+        if not isinstance(title, str) or not isinstance(content, str):
+            return jsonify({"error": "Title and content are required for every journal"}), 400
+        title = title.strip()
+        content = content.strip()
+        if not title or not content:
+            return jsonify({"error": "Title and content are required for every journal"}), 400
+        entries.append({
+            'title': title,
+            'content': content,
+            'tags': journal.get('tags', []),
+            'folder_id': journal.get('folder_id')
+        })
+    
+    try:
+        count = db.create_journals_bulk(entries)
+        return jsonify({"count": count, "message": "Journals imported successfully"}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/journals/<int:journal_id>', methods=['PUT'])
 def update_journal(journal_id):
     """Update a journal entry"""
@@ -238,8 +413,144 @@ def delete_folder(folder_id):
 
 # ==================== CHAT ENDPOINT ====================
 
-# Simple conversation memory storage (in production, use Redis or database)
-conversation_memory = {}
+# Rolling conversation history per session (Redis when REDIS_URL is set)
+conversation_store = create_conversation_store()
+
+# Replies to exact and near-duplicate opening messages, persisted in the database.
+# Only turns with no history are cached: their prompt is the message alone, so
+# the reply fits any session, while later replies depend on the conversation
+reply_cache = SemanticCache(max_entries=512, threshold=0.92, ttl=OPENING_REPLY_TTL)
+
+def warm_reply_cache():
+    """Reload unexpired cached replies saved by previous runs"""
+    try:
+        for entry in db.get_opening_replies(limit=reply_cache.max_entries):
+            reply_cache.put(
+                entry['message'],
+                entry['reply'],
+                vector_from_bytes(entry['embedding']),
+                created_at=entry['created_ts']
+            )
+    except Exception as e:
+        print(f"Warning: could not load semantic cache: {e}")
+
+def remember_reply(user_message, reply, embedding=None):
+    """Cache an opening reply in memory and queue it for the database"""
+    vector = reply_cache.put(user_message, reply, embedding)
+    writer.add_opening_reply(message_hash(user_message), user_message, reply, vector_to_bytes(vector))
+
+warm_reply_cache()
+
+# Fallback trigger words grouped by the branch of generate_fallback they feed
+_FALLBACK_KEYWORDS = {
+    'overwhelmed': ("everything", "nothing", "all of it", "all", "i am not understanding anything", "not understanding"),
+    'physics': ("force", "gravity", "spin", "rotation", "centrifugal", "weight"),
+    'unsure': ("don't know", "dont know", "idk", "confused", "no idea"),
+    'torque': ("torque",),
+    'toque': ("toque",),
+    'spinning': ("rotation", "spin", "turn"),
+    'rotation': ("rotation",),
+    'learning': ("teach me", "learn", "start", "beginning", "begenning"),
+    'space': ("space",),
+}
+
+# Trigger word -> branch ids, and one pattern that finds every trigger in a single pass
+_FALLBACK_BRANCHES = {}
+for _branch, _words in _FALLBACK_KEYWORDS.items():
+    for _word in _words:
+        _FALLBACK_BRANCHES.setdefault(_word, set()).add(_branch)
+# The lookahead reports a match at every position, so overlapping words are all found
+_FALLBACK_RE = re.compile('(?=(%s))' % '|'.join(
+    re.escape(word) for word in sorted(_FALLBACK_BRANCHES, key=len, reverse=True)
+))
+
+_SHORT_MESSAGES = frozenset(["rotation", "physics", "hard", "difficult", "clear", "small", "tiny"])
+
+def generate_fallback(user_message):
+    """Generate contextual fallback response based on user message"""
+    msg_lower = user_message.lower().strip()
+    hits = set()
+    for word in _FALLBACK_RE.findall(msg_lower):
+        hits |= _FALLBACK_BRANCHES[word]
+    
+    # Handle overwhelm/everything responses
+    if 'overwhelmed' in hits:
+        return "Feeling overwhelmed? Let's start with something tiny and concrete. Picture a door opening - that's rotation! What makes a door easy or hard to push open?"
+    
+    # Handle substantial physics answers (acknowledge good thinking!)
+    if len(msg_lower) > 30 and 'physics' in hits:
+        return f"Excellent thinking! You mentioned forces - that's exactly the right track. Now here's a key question: if you spin a coin on a table, what do you think slows it down and makes it stop?"
+    
+    # Handle "don't know" or confusion with better context
+    if 'unsure' in hits:
+        if 'torque' in hits or 'toque' in hits:
+            return "You're unsure what torque means. Quick anchor: torque is the 'twist' effect of a force—pushing farther from the pivot makes rotation easier. If you push a door near the hinges vs the handle, where does the same push create more rotation?"
+        elif 'spinning' in hits:
+            return "You're feeling lost about rotation. Here's a simple start: rotation is just spinning around a center point, like a wheel or door. What happens when you try to stop a spinning coin with your finger?"
+        else:
+            return "That's completely normal when learning something new! Let's try a concrete example: imagine pushing a door. Would it be easier to push near the hinges or near the handle?"
+    
+    # Handle typos and corrections
+    if 'toque' in hits and 'torque' not in hits:
+        return "I'm assuming you meant 'torque' (the twist-force that causes rotation). Torque is like the 'oomph' that makes things spin. Are you asking how torque differs from regular force?"
+    
+    # Handle basic single words or very short responses
+    if len(msg_lower) < 15 or msg_lower in _SHORT_MESSAGES:
+        return f"You said '{user_message}'. Let's connect this to something you can picture. Think of a spinning coin - what do you think makes it start spinning, and what makes it wobble and fall over?"
+    
+    # Handle learning requests 
+    if 'learning' in hits:
+        return "Perfect! You want to learn from the beginning. Let's start with the most basic question: when you open a door, do you push near the hinges or near the handle? Why do you think that is?"
+    
+    # Handle specific physics concepts
+    if 'space' in hits and ('torque' in hits or 'rotation' in hits):
+        return "You're asking about torque vs space concepts. Torque is about causing rotation; space is where things exist and move. Are you wondering how rotational motion works in different environments?"
+    
+    # Default fallback - more engaging
+    return f"I hear you saying '{user_message}'. Let's make this super concrete: imagine you're trying to loosen a tight jar lid. Where do you grip it, and how do you twist? What makes it easier or harder?"
+
+def start_chat_turn(session_id, user_message):
+    """Record the user's message; returns (cached reply or None, embedding, whether the turn is cacheable)"""
+    writer.add_chat_message(session_id, 'user', user_message)
+    opening = not conversation_store.get_context(session_id)
+    
+    # Add user message to the session history (trimmed to a token budget)
+    conversation_store.append(session_id, f"Human: {user_message}")
+    
+    # Answer a repeated opening message without calling Gemini; later turns
+    # skip the lookup (and its embedding) since their replies are never cached
+    if not opening:
+        return None, None, False
+    cached_reply, embedding = reply_cache.get(user_message)
+    return cached_reply, embedding, True
+
+def build_chat_prompt(session_id):
+    """Build the Gemini prompt from the session history"""
+    conversation_context = conversation_store.get_context(session_id)
+    return f"""Previous conversation:
+{conversation_context}
+
+Please continue the conversation naturally, maintaining the Socratic teaching approach while building on what has been discussed.
+
+Important: Don't use generic openers ('Before we begin…', 'Perfect! Before…', 'Excellent! Before…'). Acknowledge the last user message, give a micro-anchor if needed, and ask one targeted question."""
+
+def finish_chat_turn(session_id, user_message, reply, embedding=None, remember=False):
+    """Save the AI reply, cache it for similar opening messages and add it to the history"""
+    writer.add_chat_message(session_id, 'ai', reply)
+    if remember:
+        remember_reply(user_message, reply, embedding)
+    conversation_store.append(session_id, f"Scoratis: {reply}")
+
+def sse_event(payload):
+    """Format one Server-Sent Events message carrying a JSON payload"""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+def sse_response(events):
+    """Wrap an iterable of SSE messages in an unbuffered event-stream response"""
+    return app.response_class(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep reverse proxies from buffering the stream
+    })
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -250,111 +561,103 @@ def chat():
     
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
+    if not isinstance(session_id, str):
+        # The ID reaches the history store and the writer queue as a key
+        return jsonify({"error": "session_id must be a string"}), 400
     
     genai = get_genai()
     
-    def generate_fallback(user_message):
-        """Generate contextual fallback response based on user message"""
-        msg_lower = user_message.lower().strip()
-        
-        # Handle overwhelm/everything responses
-        if any(word in msg_lower for word in ["everything", "nothing", "all of it", "all", "i am not understanding anything", "not understanding"]):
-            return "Feeling overwhelmed? Let's start with something tiny and concrete. Picture a door opening - that's rotation! What makes a door easy or hard to push open?"
-        
-        # Handle substantial physics answers (acknowledge good thinking!)
-        if len(msg_lower) > 30 and any(word in msg_lower for word in ["force", "gravity", "spin", "rotation", "centrifugal", "weight"]):
-            return f"Excellent thinking! You mentioned forces - that's exactly the right track. Now here's a key question: if you spin a coin on a table, what do you think slows it down and makes it stop?"
-        
-        # Handle "don't know" or confusion with better context
-        if any(phrase in msg_lower for phrase in ["don't know", "dont know", "idk", "confused", "no idea"]):
-            if "torque" in msg_lower or "toque" in msg_lower:
-                return "You're unsure what torque means. Quick anchor: torque is the 'twist' effect of a force—pushing farther from the pivot makes rotation easier. If you push a door near the hinges vs the handle, where does the same push create more rotation?"
-            elif any(word in msg_lower for word in ["rotation", "spin", "turn"]):
-                return "You're feeling lost about rotation. Here's a simple start: rotation is just spinning around a center point, like a wheel or door. What happens when you try to stop a spinning coin with your finger?"
-            else:
-                return "That's completely normal when learning something new! Let's try a concrete example: imagine pushing a door. Would it be easier to push near the hinges or near the handle?"
-        
-        # Handle typos and corrections
-        if "toque" in msg_lower and "torque" not in msg_lower:
-            return "I'm assuming you meant 'torque' (the twist-force that causes rotation). Torque is like the 'oomph' that makes things spin. Are you asking how torque differs from regular force?"
-        
-        # Handle basic single words or very short responses
-        if len(msg_lower) < 15 or msg_lower in ["rotation", "physics", "hard", "difficult", "clear", "small", "tiny"]:
-            return f"You said '{user_message}'. Let's connect this to something you can picture. Think of a spinning coin - what do you think makes it start spinning, and what makes it wobble and fall over?"
-        
-        # Handle learning requests 
-        if any(phrase in msg_lower for phrase in ["teach me", "learn", "start", "beginning", "begenning"]):
-            return "Perfect! You want to learn from the beginning. Let's start with the most basic question: when you open a door, do you push near the hinges or near the handle? Why do you think that is?"
-        
-        # Handle specific physics concepts
-        if "space" in msg_lower and ("torque" in msg_lower or "rotation" in msg_lower):
-            return "You're asking about torque vs space concepts. Torque is about causing rotation; space is where things exist and move. Are you wondering how rotational motion works in different environments?"
-        
-        # Default fallback - more engaging
-        return f"I hear you saying '{user_message}'. Let's make this super concrete: imagine you're trying to loosen a tight jar lid. Where do you grip it, and how do you twist? What makes it easier or harder?"
-    
     if not genai:
         response = generate_fallback(user_message)
         return jsonify({"reply": response, "source": "fallback"})
     
     try:
-        # Set socket timeout for faster response
-        socket.setdefaulttimeout(15)
-        
-        # Get or initialize conversation history
-        if session_id not in conversation_memory:
-            conversation_memory[session_id] = []
-        
-        # Save user message to database
-        db.add_chat_message(session_id, 'user', user_message)
-        
-        # Add user message to in-memory history for this request
-        conversation_memory[session_id].append(f"Human: {user_message}")
-        
-        # Keep only last 10 messages to avoid token limits
-        if len(conversation_memory[session_id]) > 10:
-            conversation_memory[session_id] = conversation_memory[session_id][-10:]
-        
-        # Build conversation context
-        conversation_context = "\n".join(conversation_memory[session_id])
-        full_prompt = f"""Previous conversation:
-{conversation_context}
-
-Please continue the conversation naturally, maintaining the Socratic teaching approach while building on what has been discussed.
-
-Important: Don't use generic openers ('Before we begin…', 'Perfect! Before…', 'Excellent! Before…'). Acknowledge the last user message, give a micro-anchor if needed, and ask one targeted question."""
-        
-        model = genai.GenerativeModel(
-            model_name='gemini-1.5-flash',
-            system_instruction=SYSTEM_PROMPT
-        )
-        
-        generation_config = genai.GenerationConfig(
-            max_output_tokens=300,  # Allow for more detailed anchor-question responses
-            temperature=0.7,  # Slightly more focused for teaching
-            top_p=0.9
-        )
-        
-        response = model.generate_content(
+        cached_reply, embedding, cacheable = start_chat_turn(session_id, user_message)
+        if cached_reply is not None:
+            finish_chat_turn(session_id, user_message, cached_reply)
+            return jsonify({"reply": cached_reply, "source": "semantic_cache", "session_id": session_id})
+        
+        full_prompt = build_chat_prompt(session_id)
+        # Identical prompts already in flight (e.g. the same opening question
+        # from several users) share one Gemini call
+        reply = gemini_requests.run(full_prompt, lambda: _chat_model.generate_content(
             full_prompt,
-            generation_config=generation_config
-        )
-        
-        # Save AI response to database
-        db.add_chat_message(session_id, 'ai', response.text)
+            generation_config=_generation_config,
+            request_options={"timeout": 15}  # Per-call timeout instead of a global socket default
+        ).text)
         
-        # Add AI response to history
-        conversation_memory[session_id].append(f"Scoratis: {response.text}")
-        
-        return jsonify({"reply": response.text, "source": "ai", "session_id": session_id})
+        finish_chat_turn(session_id, user_message, reply, embedding, remember=cacheable)
+        return jsonify({"reply": reply, "source": "ai", "session_id": session_id})
         
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
         response = generate_fallback(user_message)
         # Save fallback response to database
-        db.add_chat_message(session_id, 'ai', response)
+        writer.add_chat_message(session_id, 'ai', response)
         return jsonify({"reply": response, "source": "fallback"})
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat with Scoratis AI, streaming the reply as Server-Sent Events"""
+    # Same JSON body as /chat. POST only: a turn writes history, and an
+    # EventSource GET would repeat it on every automatic reconnect
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '').strip()
+    session_id = data.get('session_id', 'default')
+    
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    if not isinstance(session_id, str):
+        # The ID reaches the history store and the writer queue as a key
+        return jsonify({"error": "session_id must be a string"}), 400
+    
+    genai = get_genai()
+    
+    if not genai:
+        response = generate_fallback(user_message)
+        return sse_response([
+            sse_event({"chunk": response}),
+            sse_event({"done": True, "source": "fallback"})
+        ])
+    
+    def generate():
+        parts = []
+        try:
+            cached_reply, embedding, cacheable = start_chat_turn(session_id, user_message)
+            if cached_reply is not None:
+                finish_chat_turn(session_id, user_message, cached_reply)
+                yield sse_event({"chunk": cached_reply})
+                yield sse_event({"done": True, "source": "semantic_cache", "session_id": session_id})
+                return
+            
+            stream = _chat_model.generate_content(
+                build_chat_prompt(session_id),
+                generation_config=_generation_config,
+                stream=True,
+                request_options={"timeout": 15}
+            )
+            for chunk in stream:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield sse_event({"chunk": chunk.text})
+            
+            finish_chat_turn(session_id, user_message, ''.join(parts), embedding, remember=cacheable)
+            yield sse_event({"done": True, "source": "ai", "session_id": session_id})
+            
+        except Exception as e:
+            print(f"Error streaming from Gemini API: {e}")
+            if parts:
+                # Keep what the user has already seen
+                finish_chat_turn(session_id, user_message, ''.join(parts))
+                yield sse_event({"done": True, "source": "ai", "session_id": session_id})
+                return
+            response = generate_fallback(user_message)
+            writer.add_chat_message(session_id, 'ai', response)
+            yield sse_event({"chunk": response})
+            yield sse_event({"done": True, "source": "fallback"})
+    
+    return sse_response(generate())
+
 @app.route('/chat/clear', methods=['POST'])
 def clear_chat():
     """Clear conversation memory for a session (but keep in database)"""
@@ -362,8 +665,7 @@ def clear_chat():
     session_id = data.get('session_id', 'default')
     
     # Clear from memory only - DO NOT delete from database
-    if session_id in conversation_memory:
-        del conversation_memory[session_id]
+    conversation_store.clear(session_id)
     
     # Note: We're NOT calling db.clear_conversation() here anymore
     # Conversations should persist in database for history
@@ -435,6 +737,39 @@ def empty_trash():
 
 # ==================== VIDEO ENDPOINTS ====================
 
+# Sample results served when the YouTube API is not configured; {q} is the search query
+_SAMPLE_TEMPLATE = (
+    {
+        "video_id": "dQw4w9WgXcQ",
+        "title": "Educational Content: {q} - Introduction",
+        "channel": "Educational Channel",
+        "thumbnail": "https://via.placeholder.com/320x180/8A2BE2/FFFFFF?text=Video+1",
+        "description": "Learn about {q} in this comprehensive introduction.",
+        "published_at": "2024-01-01T00:00:00Z",
+        "duration": "10:30",
+        "view_count": "1.2M"
+    },
+    {
+        "video_id": "dQw4w9WgXcQ",
+        "title": "Advanced {q} Techniques",
+        "channel": "Science Academy",
+        "thumbnail": "https://via.placeholder.com/320x180/00BFFF/FFFFFF?text=Video+2",
+        "description": "Dive deeper into {q} with advanced concepts.",
+        "published_at": "2024-01-02T00:00:00Z",
+        "duration": "15:45",
+        "view_count": "850K"
+    }
+)
+_SAMPLE_FIELDS = ("title", "description")
+
+@functools.lru_cache(maxsize=256)
+def _sample_videos(query, n):
+    """Fill the sample results for a query (memoized; callers must not mutate the result)"""
+    return [
+        {**template, **{key: template[key].format(q=query) for key in _SAMPLE_FIELDS}}
+        for template in _SAMPLE_TEMPLATE[:n]
+    ]
+
 @app.route('/videos/search', methods=['GET'])
 def search_videos():
     """Search for videos using YouTube API"""
@@ -448,36 +783,11 @@ def search_videos():
     
     # Fallback sample videos if YouTube API is not available
     if not youtube_client:
-        sample_videos = [
-            {
-                "video_id": "dQw4w9WgXcQ",
-                "title": f"Educational Content: {query} - Introduction",
-                "channel": "Educational Channel",
-                "thumbnail": "https://via.placeholder.com/320x180/8A2BE2/FFFFFF?text=Video+1",
-                "description": f"Learn about {query} in this comprehensive introduction.",
-                "published_at": "2024-01-01T00:00:00Z",
-                "duration": "10:30",
-                "view_count": "1.2M"
-            },
-            {
-                "video_id": "dQw4w9WgXcQ",
-                "title": f"Advanced {query} Techniques",
-                "channel": "Science Academy",
-                "thumbnail": "https://via.placeholder.com/320x180/00BFFF/FFFFFF?text=Video+2",
-                "description": f"Dive deeper into {query} with advanced concepts.",
-                "published_at": "2024-01-02T00:00:00Z",
-                "duration": "15:45",
-                "view_count": "850K"
-            }
-        ]
-        return jsonify({"videos": sample_videos[:max_results], "source": "sample"})
+        return jsonify({"videos": _sample_videos(query, max_results), "source": "sample"})
     
     try:
-        # Set timeout for faster response
-        socket.setdefaulttimeout(10)
-        
         # Search for videos
-        search_response = youtube_client.search().list(
+        search_response = youtube_client.search(
             q=query,
             part='snippet',
             type='video',
@@ -485,7 +795,7 @@ def search_videos():
             order='relevance',
             safeSearch='moderate',
             videoEmbeddable='true'
-        ).execute()
+        )
         
         video_ids = [item['id']['videoId'] for item in search_response.get('items', [])]
         
@@ -493,10 +803,10 @@ def search_videos():
             return jsonify({"videos": [], "message": "No videos found"})
         
         # Get additional video details
-        videos_response = youtube_client.videos().list(
+        videos_response = youtube_client.videos(
             part='statistics,contentDetails',
             id=','.join(video_ids)
-        ).execute()
+        )
         
         # Create video details map
         video_details = {item['id']: item for item in videos_response.get('items', [])}
@@ -526,18 +836,16 @@ def search_videos():
                 "view_count": view_count_formatted
             }
             formatted_videos.append(video_data)
-            
-            # Add to video history
-            try:
-                db.add_video_to_history(
-                    video_id, 
-                    snippet['title'], 
-                    snippet['channelTitle'],
-                    video_data['thumbnail'],
-                    query
-                )
-            except:
-                pass  # Ignore history errors
+        
+        # Record the results in watch history after the response is sent
+        history_rows = [{
+            'video_id': video['video_id'],
+            'title': video['title'],
+            'channel': video['channel'],
+            'thumbnail_url': video['thumbnail'],
+            'search_query': query
+        } for video in formatted_videos]
+        writer.add_videos_to_history(history_rows)
         
         return jsonify({"videos": formatted_videos, "source": "youtube"})
         
@@ -547,7 +855,7 @@ def search_videos():
         
         if "quotaexceeded" in error_msg:
             return jsonify({"error": "YouTube API quota exceeded. Please try again later."}), 429
-        elif "keyinvalid" in error_msg or "forbidden" in error_msg:
+        elif "keyinvalid" in error_msg or "api_key_invalid" in error_msg or "forbidden" in error_msg:
             return jsonify({"error": "Invalid YouTube API key."}), 401
         else:
             return jsonify({"error": f"Failed to fetch videos: {str(e)}"}), 500
@@ -565,12 +873,14 @@ def get_video_history():
 
 # ==================== UTILITY FUNCTIONS ====================
 
+_DURATION_RE = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+
+# Durations and view counts repeat heavily across results, so formatted
+# values are memoized
+@functools.lru_cache(maxsize=4096)
 def parse_youtube_duration(duration):
     """Parse YouTube duration format (PT1H2M3S) to readable format"""
-    import re
-    
-    pattern = r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?'
-    match = re.match(pattern, duration)
+    match = _DURATION_RE.match(duration)
     
     if not match:
         return "0:00"
@@ -585,6 +895,7 @@ def parse_youtube_duration(duration):
     else:
         return f"{minutes}:{seconds:02d}"
 
+@functools.lru_cache(maxsize=4096)
 def format_view_count(count):
     """Format view count to readable format"""
     if count >= 1_000_000:
@@ -620,4 +931,5 @@ if __name__ == '__main__':
     print("📊 Database initialized successfully")
     print("🔑 API keys loaded from environment")
     print("🌐 Server starting on http://127.0.0.1:5001")
+    print("⚠️  Development server only; run `gunicorn -c gunicorn_gevent.conf.py wsgi:app` in production")
     app.run(debug=True, port=5001, host='127.0.0.1')
\ No newline at end of file
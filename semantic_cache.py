@@ -0,0 +1,134 @@
+"""Two-tier response cache for the Gemini chat endpoints.
+
+Tier 1 matches the normalized message text exactly. Tier 2 embeds the
+message with a small sentence-transformers model and reuses the reply of
+the most similar recent message when the cosine similarity clears a
+threshold. sentence-transformers is optional: without it only the exact
+tier is active.
+"""
+import hashlib
+import importlib
+import threading
+import time
+from collections import OrderedDict
+from lazy_import import lazy_import
+
+# Deferred until the first embedding; None when missing (exact matches still work)
+np = lazy_import('numpy')
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Lazily loaded embedding model (False once loading has failed)
+_embedder = None
+
+def get_embedder():
+    """Lazy load the sentence-transformers embedding model"""
+    global _embedder
+    if _embedder is None:
+        _embedder = False
+        if np is None:
+            print("Warning: numpy not available, semantic cache uses exact matches only")
+            return None
+        try:
+            module = importlib.import_module('sentence_transformers')
+            _embedder = module.SentenceTransformer(EMBEDDING_MODEL)
+        except Exception as e:
+            print(f"Warning: sentence-transformers not available, semantic cache uses exact matches only ({e})")
+    return _embedder if _embedder is not False else None
+
+def normalize(text):
+    """Lowercase and collapse whitespace so trivial variations share a key"""
+    return ' '.join(text.lower().split())
+
+def message_hash(text):
+    """Stable SHA-1 key of the normalized message, used for persistence"""
+    return hashlib.sha1(normalize(text).encode('utf-8')).hexdigest()
+
+def vector_to_bytes(vector):
+    """Serialize an embedding for storage (None stays None)"""
+    return None if vector is None else vector.astype(np.float32).tobytes()
+
+def vector_from_bytes(data):
+    """Restore an embedding stored by vector_to_bytes"""
+    if data is None or np is None:
+        return None
+    return np.frombuffer(data, dtype=np.float32)
+
+class SemanticCache:
+    def __init__(self, max_entries=512, threshold=0.85, ttl=None):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl  # Seconds an entry stays valid; None keeps entries until evicted
+        self._lock = threading.Lock()
+
+        # Tier 1: normalized text -> (reply, created_at), LRU ordered
+        self._exact = OrderedDict()
+
+        # Tier 2: ring buffer of the last max_entries unit-length embeddings
+        self._vectors = None
+        self._replies = [None] * max_entries
+        self._created = [0.0] * max_entries
+        self._next_slot = 0
+        self._filled = 0
+
+    def _fresh(self, created_at):
+        return self.ttl is None or time.time() - created_at < self.ttl
+
+    def embed(self, message):
+        """Return the unit-length embedding of a message, or None if unavailable"""
+        model = get_embedder()
+        if model is None:
+            return None
+        return model.encode(normalize(message), normalize_embeddings=True).astype(np.float32)
+
+    def get(self, message):
+        """Look up a reply; returns (reply or None, embedding for a later put)"""
+        key = normalize(message)
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is not None and self._fresh(entry[1]):
+                self._exact.move_to_end(key)
+                return entry[0], None
+
+        vector = self.embed(message)
+        if vector is None:
+            return None, None
+
+        with self._lock:
+            if not self._filled:
+                return None, vector
+            # Vectors are normalized, so the dot product is the cosine similarity
+            scores = self._vectors[:self._filled] @ vector
+            best = int(scores.argmax())
+            if scores[best] >= self.threshold and self._fresh(self._created[best]):
+                return self._replies[best], vector
+        return None, vector
+
+    def put(self, message, reply, vector=None, created_at=None):
+        """Store a reply, reusing the embedding computed by get() when given
+
+        Returns the embedding (or None) so callers can persist it.
+        """
+        key = normalize(message)
+        created_at = created_at or time.time()
+        with self._lock:
+            self._exact[key] = (reply, created_at)
+            self._exact.move_to_end(key)
+            if len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+
+        if vector is None:
+            vector = self.embed(message)
+        if vector is None:
+            return None
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._next_slot
+            self._vectors[slot] = vector
+            self._replies[slot] = reply
+            self._created[slot] = created_at
+            self._next_slot = (slot + 1) % self.max_entries
+            self._filled = min(self._filled + 1, self.max_entries)
+        return vector
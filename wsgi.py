@@ -0,0 +1,12 @@
+"""Production entry point for main_professional under Gunicorn's gevent worker.
+
+    gunicorn -c gunicorn_gevent.conf.py wsgi:app
+
+Sockets are monkey-patched before the app (and requests, redis, the Gemini
+SDK) is imported, so every outbound HTTP call yields to other requests
+instead of blocking the worker.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+from main_professional import app  # noqa: E402